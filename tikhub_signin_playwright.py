@@ -8,6 +8,8 @@ TikHub 自动签到脚本
 import asyncio
 import sys
 import io
+import cProfile
+import pstats
 
 # 设置 Windows 控制台输出编码为 UTF-8
 if sys.platform == 'win32':
@@ -18,30 +20,609 @@ if sys.platform == 'win32':
         pass
 
 from playwright.async_api import async_playwright
+import argparse
+import calendar
+import hashlib
 import json
 import os
 import time
+import gzip
+import threading
 import random
 import requests
+from collections import deque
+from contextlib import asynccontextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict
 
+# 可选依赖：psutil（未安装时在 Linux 上直接读取 /proc）
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
 # 每日一言API
 DAILY_QUOTES_API = "https://v1.hitokoto.cn/?encode=json&c=k"
 
 
+# Telegram 单条消息最大长度
+TG_MAX_MESSAGE_LENGTH = 4096
+
+# Telegram 同一会话发送速率（条/秒）
+TG_RATE_PER_SECOND = 1.0
+
+WEEKDAYS = ["星期一", "星期二", "星期三", "星期四", "星期五", "星期六", "星期日"]
+
+# 激励语
+MOTTOS = [
+    "打卡成功！向着梦想飞奔吧~",
+    "坚持签到，未来可期！",
+    "今日已签到，继续保持！",
+    "打卡完成，享受TikHub服务！",
+    "签到成功，美好的一天开始了！",
+    "打卡成功，每天进步一点点！",
+    "签到打卡，从未间断！",
+    "又是美好的一天，签到成功！"
+]
+
+# 每日一言获取失败时的备用格言
+FALLBACK_QUOTES = [
+    "不要等待，时机永远不会恰到好处。 —— 拿破仑·希尔",
+    "合理安排时间，就等于节约时间。 —— 培根",
+    "行动是治愈恐惧的良药。 —— 戴尔·卡耐基",
+    "成功是一段路程，而非终点。 —— 本·斯威特兰"
+]
+
+# 失败诊断文件目录
+DIAGNOSTICS_DIR = "tikhub_diagnostics"
+
+# 诊断模式：off（关闭）、events（网络事件环形缓冲区）、trace（Playwright trace）
+DIAGNOSTICS_MODES = ("off", "events", "trace")
+
+# 性能分析报告目录
+PROFILES_DIR = "tikhub_profiles"
+
+# 网络事件环形缓冲区大小（只保留最近的事件）
+NETWORK_EVENT_BUFFER_SIZE = 200
+
+# Chromium 启动参数
+BROWSER_LAUNCH_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    # 额外的反检测参数
+    '--disable-web-security',
+    '--disable-features=IsolateOrigins,site-per-process',
+    '--allow-running-insecure-content',
+    '--excludeSwitches=enable-automation',
+    '--disable-extensions',
+]
+
+# 低内存模式额外的启动参数
+LOW_MEMORY_LAUNCH_ARGS = [
+    '--renderer-process-limit=2',
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--no-first-run',
+    '--js-flags=--max-old-space-size=256',
+]
+
+# 低内存模式下不加载的资源类型
+LOW_MEMORY_BLOCKED_RESOURCES = ("image", "media", "font")
+
+# 浏览器内存采样间隔（秒）
+RSS_SAMPLE_INTERVAL = 0.5
+
+# 时间配置（单位：秒）。budget 为单个账号的总时间预算，其余等待时间都从预算中扣除
+TIMING_PROFILES = {
+    # 默认配置，与原先的固定等待时间一致
+    "normal": {
+        "budget": 120,
+        "goto_timeout": 30,
+        "render_wait": 3,
+        "popup_timeout": 2,
+        "popup_close_wait": 1.5,
+        "escape_wait": 0.5,
+        "humanize_delay": (0.2, 0.5),
+        "post_click_wait": 3,
+        "result_wait": 5,
+        "captcha_manual_wait": 30,
+        "captcha_click_wait": 2,
+        "captcha_recheck_wait": 3,
+    },
+    # 快速模式：尽量缩短等待，适合离线回放和批量运行
+    "fast": {
+        "budget": 45,
+        "goto_timeout": 20,
+        "render_wait": 1,
+        "popup_timeout": 0.3,
+        "popup_close_wait": 0.5,
+        "escape_wait": 0.2,
+        "humanize_delay": (0, 0.05),
+        "post_click_wait": 1,
+        "result_wait": 5,
+        "captcha_manual_wait": 15,
+        "captcha_click_wait": 1,
+        "captcha_recheck_wait": 1,
+    },
+    # 拟人模式：等待更长、更随机，降低被识别为机器人的概率
+    "stealthy": {
+        "budget": 180,
+        "goto_timeout": 45,
+        "render_wait": 5,
+        "popup_timeout": 3,
+        "popup_close_wait": 2,
+        "escape_wait": 1,
+        "humanize_delay": (0.4, 1.2),
+        "post_click_wait": 5,
+        "result_wait": 8,
+        "captcha_manual_wait": 45,
+        "captcha_click_wait": 3,
+        "captcha_recheck_wait": 4,
+    },
+}
+
+# 预算耗尽后保存诊断文件和关闭浏览器上下文的超时（秒），不受时间预算限制
+CLEANUP_TIMEOUT = 10
+
+# 分阶段重试策略：最多尝试次数、指数退避的基础延迟和最大延迟（秒）
+RETRY_POLICIES = {
+    # 页面加载超时或网络错误
+    "navigation": {"attempts": 3, "base_delay": 1.0, "max_delay": 8.0},
+    # 点击签到后签到API无响应
+    "api": {"attempts": 2, "base_delay": 1.0, "max_delay": 5.0},
+}
+
+# 对冲签到：单账号耗时超过历史耗时的该百分位时，在新的浏览器上下文中并行发起第二次签到
+HEDGE_PERCENTILE = 95
+
+# 计算百分位所需的最少历史样本数
+HEDGE_MIN_SAMPLES = 20
+
+# 累计指标文件（JSON 持久化）和 OpenMetrics 文本文件
+METRICS_STATE_FILE = "tikhub_metrics.json"
+METRICS_TEXT_FILE = "tikhub_metrics.prom"
+
+# 延迟直方图的桶上限（秒）
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+# 计数器：(名称, 说明)
+METRIC_COUNTERS = (
+    ("checkin_attempts", "签到尝试次数（不含索引命中跳过的账号）"),
+    ("checkin_successes", "签到成功次数"),
+    ("checkin_already", "检测到今日已签到的次数"),
+    ("checkin_failures", "签到失败次数"),
+    ("checkin_skipped", "索引命中跳过的次数"),
+    ("captcha_encounters", "遇到验证码的次数"),
+    ("budget_exhausted", "时间预算耗尽的次数"),
+)
+
+# 直方图：(名称, 对应 TikHubCheckin.timings 中的键, 说明)
+METRIC_HISTOGRAMS = (
+    ("page_load_seconds", "page_load", "概览页面加载耗时"),
+    ("button_discovery_seconds", "button_discovery", "查找签到按钮耗时"),
+    ("api_response_seconds", "api_response", "点击签到到签到API响应的耗时"),
+    ("checkin_duration_seconds", "total", "单个账号签到总耗时"),
+)
+
+# 每日签到索引文件（账号ID -> 最近一次成功签到的北京时间日期）
+DAY_INDEX_FILE = "tikhub_checkin_index.json"
+
+# 旧版本单账号时使用的签到记录文件
+LEGACY_RECORD_FILE = "tikhub_checkin_record.json"
+
+
 def get_beijing_time():
     """获取北京时间（UTC+8）"""
     return datetime.now(timezone(timedelta(hours=8)))
 
 
+def get_app_dir():
+    """获取脚本所在目录（兼容打包后的可执行文件）"""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(os.path.abspath(sys.executable))
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def get_account_id(key: str) -> str:
+    """根据账号名称（未命名时为 Cookie）生成账号ID（哈希，文件名中不暴露名称和 Cookie 内容）"""
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+
+def get_record_file_name(account_id: str) -> str:
+    """账号的签到记录文件名（单账号和多账号使用相同的命名）"""
+    return f"tikhub_checkin_record_{account_id}.json"
+
+
+def parse_account_line(line: str):
+    """
+    解析一行账号配置：`名称|Cookie`，或者只有 Cookie
+    '|' 之前的部分包含 '=' 或 ';' 时说明没有名称，整行按 Cookie 处理
+    :return: (名称或 None, Cookie)
+    """
+    name, sep, cookie = line.partition('|')
+    name = name.strip()
+    if sep and name and '=' not in name and ';' not in name:
+        return name, cookie.strip()
+    return None, line.strip()
+
+
+def parse_accounts(cookie_env: str):
+    """
+    解析账号列表，TIKHUB_COOKIE 中每行一个账号（`名称|Cookie` 或只有 Cookie）
+    指定名称时账号ID由名称生成，更新 Cookie 后签到索引和签到记录仍然属于同一个账号；
+    未指定名称时账号ID由 Cookie 生成（删除或调整行的顺序不会让其他账号误用索引），
+    更新 Cookie 后最多多签到一次，显示名称按行的顺序为 账号1、账号2……
+    :return: [{"id": 账号ID, "name": 显示名称, "cookie": Cookie}]
+    """
+    accounts = []
+    seen_ids = set()
+    seen_cookies = set()
+    named = False
+    for line in cookie_env.splitlines():
+        if not line.strip():
+            continue
+        name, cookie = parse_account_line(line)
+        if not cookie or cookie in seen_cookies:
+            continue
+        named = named or name is not None
+        account_id = get_account_id(name or cookie)
+        if account_id in seen_ids:
+            print(f"⚠️ 账号名称重复: {name}，已跳过该行")
+            continue
+        name = name or f"账号{len(accounts) + 1}"
+        seen_ids.add(account_id)
+        seen_cookies.add(cookie)
+        accounts.append({
+            "id": account_id,
+            "name": name,
+            "cookie": cookie,
+        })
+    
+    # 只有一个未命名账号时，通知中沿用原来的显示名称
+    if len(accounts) == 1 and not named:
+        accounts[0]["name"] = "Cookie用户"
+    return accounts
+
+
+def migrate_legacy_account_files(accounts, day_index: Dict[str, str]):
+    """
+    迁移旧版本的签到记录和签到索引
+    旧版本单账号时使用 tikhub_checkin_record.json，多账号时使用 Cookie 哈希作为账号ID；
+    之后为账号指定名称时，把 Cookie 哈希下的记录和索引迁移到名称对应的账号ID
+    """
+    app_dir = get_app_dir()
+    for i, account in enumerate(accounts):
+        legacy_id = get_account_id(account["cookie"])
+        if legacy_id in day_index and account["id"] not in day_index:
+            day_index[account["id"]] = day_index.pop(legacy_id)
+        
+        target = os.path.join(app_dir, get_record_file_name(account["id"]))
+        if os.path.exists(target):
+            continue
+        candidates = [get_record_file_name(legacy_id)] + ([LEGACY_RECORD_FILE] if i == 0 else [])
+        for name in candidates:
+            path = os.path.join(app_dir, name)
+            if os.path.exists(path):
+                os.replace(path, target)
+                print(f"📦 已迁移 {account['name']} 的签到记录: {name} -> {os.path.basename(target)}")
+                break
+
+
+def load_day_index(path: str = None) -> Dict[str, str]:
+    """启动时一次性加载每日签到索引，之后在内存中 O(1) 查询"""
+    path = path or os.path.join(get_app_dir(), DAY_INDEX_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        return index if isinstance(index, dict) else {}
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️ 读取签到索引失败: {e}，将重新建立索引")
+        return {}
+
+
+def save_day_index(index: Dict[str, str], path: str = None):
+    """保存每日签到索引（先写临时文件再替换，任务中途被终止时不会留下半个文件）"""
+    path = path or os.path.join(get_app_dir(), DAY_INDEX_FILE)
+    try:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"❌ 保存签到索引失败: {e}")
+
+
+def get_account_har_path(har_mode: str, har_path: str, account_id: str):
+    """
+    多账号时获取账号对应的 HAR 文件路径
+    录制时按账号ID区分文件名；回放时优先使用账号自己的录制文件，没有则使用共享文件
+    """
+    if not har_mode or not har_path:
+        return har_path
+    root, ext = os.path.splitext(har_path)
+    account_path = f"{root}_{account_id}{ext or '.har'}"
+    if har_mode == "record" or os.path.exists(account_path):
+        return account_path
+    return har_path
+
+
+def get_process_tree_rss(root_pid: int = None) -> Optional[int]:
+    """
+    获取进程树（不含根进程本身）的 RSS 总和（字节）
+    Playwright 的驱动进程和 Chromium 都是当前 Python 进程的子孙进程
+    :return: 无法获取时返回 None
+    """
+    root_pid = root_pid or os.getpid()
+    
+    if psutil is not None:
+        try:
+            total = 0
+            for child in psutil.Process(root_pid).children(recursive=True):
+                try:
+                    total += child.memory_info().rss
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+            return total
+        except psutil.Error:
+            return None
+    
+    if not os.path.isdir('/proc'):
+        return None
+    
+    # 通过 /proc/<pid>/stat 建立父子关系
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'rb') as f:
+                stat = f.read()
+            # 进程名可能包含空格和括号，从最后一个 ')' 之后开始解析
+            ppid = int(stat[stat.rindex(b')') + 2:].split()[1])
+            children.setdefault(ppid, []).append(int(entry))
+        except (OSError, ValueError):
+            continue
+    
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    total = 0
+    stack = list(children.get(root_pid, []))
+    while stack:
+        pid = stack.pop()
+        stack.extend(children.get(pid, []))
+        try:
+            with open(f'/proc/{pid}/statm', 'rb') as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, ValueError, IndexError):
+            continue
+    return total
+
+
+class BrowserManager:
+    """
+    共享浏览器管理：多个账号复用同一个 Chromium，每个账号使用独立上下文
+    采样浏览器进程树内存，超过阈值时等待所有账号完成后重启浏览器
+    """
+    
+    def __init__(self, headless: bool = None, low_memory: bool = False, max_rss_mb: float = None):
+        """
+        :param headless: 是否无头模式，默认 GitHub Actions 中使用无头模式
+        :param low_memory: 是否使用低内存启动参数
+        :param max_rss_mb: 浏览器进程树内存上限（MB），超过后回收重启浏览器
+        """
+        if headless is None:
+            headless = os.environ.get('GITHUB_ACTIONS') == 'true'
+        self.headless = headless
+        self.low_memory = low_memory
+        self.max_rss_mb = max_rss_mb
+        
+        self.browser = None
+        self.restarts = 0
+        self.peak_rss = 0
+        self._playwright = None
+        self._active = 0
+        self._draining = False
+        self._cond = asyncio.Condition()
+        self._leases = []
+        self._sampler = None
+    
+    async def _launch(self):
+        """启动浏览器"""
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        args = BROWSER_LAUNCH_ARGS + (LOW_MEMORY_LAUNCH_ARGS if self.low_memory else [])
+        self.browser = await self._playwright.chromium.launch(
+            headless=self.headless,  # GitHub Actions自动使用无头模式
+            args=args
+        )
+        if self._sampler is None:
+            self._sampler = asyncio.ensure_future(self._sample_loop())
+    
+    async def _sample_loop(self):
+        """后台定时采样浏览器进程树内存"""
+        while True:
+            await self._sample()
+            await asyncio.sleep(RSS_SAMPLE_INTERVAL)
+    
+    async def _sample(self) -> Optional[int]:
+        """
+        采样一次内存，并更新正在运行的账号的统计
+        采样的是整个浏览器进程树（含 Playwright 驱动），无法区分账号；
+        并发运行时同一份采样会计入所有正在运行的账号，同时记录最多有几个账号共享
+        """
+        rss = await asyncio.to_thread(get_process_tree_rss)
+        if rss is None:
+            return None
+        self.peak_rss = max(self.peak_rss, rss)
+        for stats in self._leases:
+            stats["shared"] = max(stats.get("shared", 1), len(self._leases))
+            stats["peak"] = max(stats.get("peak", 0), rss)
+            stats["total"] = stats.get("total", 0) + rss
+            stats["samples"] = stats.get("samples", 0) + 1
+        return rss
+    
+    @asynccontextmanager
+    async def lease(self, stats: dict = None):
+        """
+        获取浏览器供一个账号使用
+        :param stats: 用于记录该账号运行期间内存统计的字典
+        """
+        stats = {} if stats is None else stats
+        async with self._cond:
+            # 浏览器回收中，等待重启完成
+            await self._cond.wait_for(lambda: not self._draining)
+            if self.browser is None or not self.browser.is_connected():
+                await self._launch()
+            self._active += 1
+            self._leases.append(stats)
+        await self._sample()
+        try:
+            yield self.browser
+        finally:
+            await self._sample()
+            self._leases.remove(stats)
+            await self._release()
+    
+    async def _release(self):
+        """账号完成后检查内存，必要时回收浏览器"""
+        async with self._cond:
+            self._active -= 1
+            if self.max_rss_mb and not self._draining:
+                rss = await asyncio.to_thread(get_process_tree_rss)
+                if rss and rss / 1024 / 1024 > self.max_rss_mb:
+                    print(f"♻️ 浏览器内存 {rss / 1024 / 1024:.0f} MB 超过上限 {self.max_rss_mb:.0f} MB，"
+                          f"等待 {self._active} 个账号完成后重启浏览器")
+                    self._draining = True
+            if self._draining and self._active == 0:
+                await self.browser.close()
+                self.browser = None
+                self.restarts += 1
+                self._draining = False
+                print("♻️ 浏览器已回收，下一个账号将重新启动浏览器")
+            self._cond.notify_all()
+    
+    async def stop(self):
+        """关闭浏览器和 Playwright"""
+        if self._sampler is not None:
+            self._sampler.cancel()
+            self._sampler = None
+        if self.browser is not None:
+            await self.browser.close()
+            self.browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+def format_rss_stats(stats: dict) -> str:
+    """格式化账号运行期间的浏览器整体内存统计（不是单个账号的内存）"""
+    if not stats.get("samples"):
+        return "浏览器整体内存: 无数据"
+    peak = stats["peak"] / 1024 / 1024
+    avg = stats["total"] / stats["samples"] / 1024 / 1024
+    shared = f"，期间最多 {stats['shared']} 个账号同时运行" if stats.get("shared", 1) > 1 else ""
+    return f"浏览器整体内存: 峰值 {peak:.0f} MB，平均 {avg:.0f} MB{shared}"
+
+
+def backoff_delay(policy: dict, attempt: int) -> float:
+    """
+    指数退避延迟（带抖动）
+    :param attempt: 已失败的次数（从 0 开始）
+    """
+    delay = min(policy["max_delay"], policy["base_delay"] * (2 ** attempt))
+    # 在 [delay/2, delay] 之间随机，避免多个账号同时重试
+    return random.uniform(delay / 2, delay)
+
+
+class BudgetExhausted(Exception):
+    """单个账号的时间预算耗尽"""
+    
+    def __init__(self, phase: str):
+        self.phase = phase
+        super().__init__(f"时间预算耗尽于阶段: {phase}")
+
+
+class DeadlineBudget:
+    """单个账号的截止时间预算，所有步骤的超时和等待都从中扣除"""
+    
+    def __init__(self, seconds: float, deadline: float = None):
+        """
+        :param seconds: 预算（秒）
+        :param deadline: 绝对截止时间（time.monotonic()），传入时忽略 seconds，用于多次尝试共享同一个预算
+        """
+        self.started_at = time.monotonic()
+        self.deadline = deadline if deadline is not None else self.started_at + seconds
+        self.total = self.deadline - self.started_at
+        self.phase = "启动"
+    
+    def enter(self, phase: str):
+        """进入新阶段，预算已耗尽时直接失败"""
+        self.phase = phase
+        self.check()
+    
+    def remaining(self) -> float:
+        """剩余预算（秒）"""
+        return max(0.0, self.deadline - time.monotonic())
+    
+    def elapsed(self) -> float:
+        """已用时间（秒）"""
+        return time.monotonic() - self.started_at
+    
+    def exhausted(self) -> bool:
+        return self.remaining() <= 0
+    
+    def check(self):
+        if self.exhausted():
+            raise BudgetExhausted(self.phase)
+    
+    def timeout_ms(self, seconds: float) -> int:
+        """Playwright 超时参数（毫秒），不超过剩余预算"""
+        self.check()
+        return max(1, int(min(seconds, self.remaining()) * 1000))
+    
+    async def sleep(self, seconds: float):
+        """等待，不超过剩余预算"""
+        self.check()
+        await asyncio.sleep(min(seconds, self.remaining()))
+    
+    async def wait_event(self, event: asyncio.Event, seconds: float) -> bool:
+        """等待事件触发，最多等待 seconds 秒（不超过剩余预算）"""
+        self.check()
+        try:
+            await asyncio.wait_for(event.wait(), timeout=min(seconds, self.remaining()))
+        except asyncio.TimeoutError:
+            pass
+        return event.is_set()
+
+
 class TikHubCheckin:
-    def __init__(self, cookie: str):
+    def __init__(self, cookie: str, account_id: str = None, account_name: str = "Cookie用户",
+                 diagnostics: str = "events", har_mode: str = None, har_path: str = None,
+                 timing_profile: str = "normal", budget_seconds: float = None, profile: bool = False,
+                 deadline: float = None):
         """
         初始化签到类
         :param cookie: 登录后的cookie字符串
+        :param account_id: 账号ID（用于区分签到记录、诊断和性能分析文件）
+        :param account_name: 通知中显示的账号名称
+        :param diagnostics: 诊断模式（off/events/trace），诊断文件只在签到失败时写入
+        :param har_mode: HAR 模式，record（录制真实会话）或 replay（离线回放，不访问网络）
+        :param har_path: HAR 文件路径
+        :param timing_profile: 时间配置（normal/fast/stealthy）
+        :param budget_seconds: 单个账号的总时间预算（秒），默认使用时间配置中的值
+        :param profile: 是否生成性能分析报告（CDP 页面指标、请求耗时和 Python cProfile）
+        :param deadline: 绝对截止时间（time.monotonic()），对冲签到时与第一次尝试共享同一个预算
         """
         self.cookie = cookie
+        self.account_id = account_id
+        self.account_name = account_name
         self.base_url = "https://user.tikhub.io"
         
         # 签到相关属性
@@ -54,13 +635,43 @@ class TikHubCheckin:
         # API响应数据
         self.api_response_data = {}
         
-        # 文件路径
-        if getattr(sys, 'frozen', False):
-            app_dir = os.path.dirname(os.path.abspath(sys.executable))
-        else:
-            app_dir = os.path.dirname(os.path.abspath(__file__))
+        # 诊断数据（环形缓冲区，只保留最近的网络事件）
+        self.diagnostics = diagnostics if diagnostics in DIAGNOSTICS_MODES else "events"
+        self.network_events = deque(maxlen=NETWORK_EVENT_BUFFER_SIZE)
         
-        self.checkin_record_file = os.path.join(app_dir, "tikhub_checkin_record.json")
+        # 文件路径（每个账号单独一个记录文件）
+        app_dir = get_app_dir()
+        record_name = get_record_file_name(account_id) if account_id else LEGACY_RECORD_FILE
+        self.checkin_record_file = os.path.join(app_dir, record_name)
+        self.diagnostics_dir = os.path.join(app_dir, DIAGNOSTICS_DIR)
+        
+        # HAR 录制/回放
+        self.har_mode = har_mode if har_path else None
+        self.har_path = har_path
+        
+        # 时间配置和预算
+        self.timing = TIMING_PROFILES.get(timing_profile, TIMING_PROFILES["normal"])
+        self.budget_seconds = budget_seconds or self.timing["budget"]
+        self.deadline = deadline
+        self.budget = None
+        self.exhausted_phase = ""
+        
+        # 运行期间浏览器进程树内存统计（字节）
+        self.rss_stats = {}
+        
+        # 各阶段耗时（秒）和验证码统计，用于累计指标
+        self.timings = {}
+        self.captcha_encountered = False
+        self._clicked_at = None
+        self._cancelled = False
+        
+        # 性能分析
+        self.profile = profile
+        self.profile_data = {"performance_metrics": {}, "navigation_timing": None, "requests": []}
+        self.profiles_dir = os.path.join(app_dir, PROFILES_DIR)
+        
+        # 签到统计缓存（保存签到记录时增量更新，通知时直接读取）
+        self.checkin_stats = None
     
     def parse_cookie_string(self, cookie_string):
         """将cookie字符串解析为Playwright需要的格式"""
@@ -76,39 +687,36 @@ class TikHubCheckin:
                 })
         return cookies
     
-    async def checkin(self) -> Dict[str, any]:
-        """执行签到"""
+    async def _humanize_pause(self):
+        """模拟人类操作间隔"""
+        await self.budget.sleep(random.uniform(*self.timing["humanize_delay"]))
+    
+    async def checkin(self, browser_manager: BrowserManager = None) -> Dict[str, any]:
+        """
+        执行签到
+        :param browser_manager: 共享的浏览器管理器，不传时单独启动一个浏览器
+        """
+        self.budget = budget = DeadlineBudget(self.budget_seconds, self.deadline)
+        timing = self.timing
+        api_event = asyncio.Event()
+        manager = browser_manager or BrowserManager()
+        profiler = self._start_python_profiler() if self.profile else None
         try:
             print("=" * 80)
             print("TikHub 自动签到")
             print("=" * 80)
             
-            async with async_playwright() as p:
-                # 启动浏览器（GitHub Actions需要无头模式）
-                is_github_actions = os.environ.get('GITHUB_ACTIONS') == 'true'
-                print(f"\n[步骤 1] 启动浏览器{'（无头模式）' if is_github_actions else ''}...")
-                
-                browser = await p.chromium.launch(
-                    headless=is_github_actions,  # GitHub Actions自动使用无头模式
-                    args=[
-                        '--disable-blink-features=AutomationControlled',
-                        '--no-sandbox',
-                        '--disable-setuid-sandbox',
-                        '--disable-dev-shm-usage',
-                        '--disable-gpu',
-                        # 额外的反检测参数
-                        '--disable-web-security',
-                        '--disable-features=IsolateOrigins,site-per-process',
-                        '--allow-running-insecure-content',
-                        '--disable-blink-features=AutomationControlled',
-                        '--excludeSwitches=enable-automation',
-                        '--disable-extensions',
-                    ]
-                )
-                
-                # 创建浏览器上下文，添加更多真实浏览器特征
+            # 启动（或复用）浏览器（GitHub Actions需要无头模式）
+            print(f"\n[步骤 1] 启动浏览器{'（无头模式）' if manager.headless else ''}"
+                  f"{'（低内存模式）' if manager.low_memory else ''}...")
+            print(f"   ⏱️ 时间预算: {budget.total:.0f} 秒")
+            budget.enter("启动浏览器")
+            
+            async with manager.lease(self.rss_stats) as browser:
+                # 创建浏览器上下文，添加更多真实浏览器特征（之后的步骤出错时也会关闭上下文并保存诊断文件）
+                viewport = {'width': 1280, 'height': 720} if manager.low_memory else {'width': 1920, 'height': 1080}
                 context = await browser.new_context(
-                    viewport={'width': 1920, 'height': 1080},
+                    viewport=viewport,
                     user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
                     locale='zh-CN',
                     timezone_id='Asia/Shanghai',
@@ -128,119 +736,170 @@ class TikHubCheckin:
                         'Cache-Control': 'max-age=0',
                     }
                 )
+                page = None
                 
-                # 注入 JavaScript 来隐藏 webdriver 特征
-                await context.add_init_script("""
-                    Object.defineProperty(navigator, 'webdriver', {
-                        get: () => undefined
-                    });
+                # 整个页面流程都受时间预算约束（没有传超时参数的 Playwright 调用也不会超出预算）
+                async def run_in_context():
+                    nonlocal page
+                    # 注入 JavaScript 来隐藏 webdriver 特征
+                    await context.add_init_script("""
+                        Object.defineProperty(navigator, 'webdriver', {
+                            get: () => undefined
+                        });
                     
-                    // 覆盖 plugins
-                    Object.defineProperty(navigator, 'plugins', {
-                        get: () => [1, 2, 3, 4, 5]
-                    });
+                        // 覆盖 plugins
+                        Object.defineProperty(navigator, 'plugins', {
+                            get: () => [1, 2, 3, 4, 5]
+                        });
                     
-                    // 覆盖 languages
-                    Object.defineProperty(navigator, 'languages', {
-                        get: () => ['zh-CN', 'zh', 'en']
-                    });
+                        // 覆盖 languages
+                        Object.defineProperty(navigator, 'languages', {
+                            get: () => ['zh-CN', 'zh', 'en']
+                        });
                     
-                    // Chrome 特征
-                    window.chrome = {
-                        runtime: {}
-                    };
+                        // Chrome 特征
+                        window.chrome = {
+                            runtime: {}
+                        };
                     
-                    // Permissions
-                    const originalQuery = window.navigator.permissions.query;
-                    window.navigator.permissions.query = (parameters) => (
-                        parameters.name === 'notifications' ?
-                            Promise.resolve({ state: Notification.permission }) :
-                            originalQuery(parameters)
-                    );
-                """)
+                        // Permissions
+                        const originalQuery = window.navigator.permissions.query;
+                        window.navigator.permissions.query = (parameters) => (
+                            parameters.name === 'notifications' ?
+                                Promise.resolve({ state: Notification.permission }) :
+                                originalQuery(parameters)
+                        );
+                    """)
+                
+                    # 低内存模式不加载图片、媒体和字体
+                    if manager.low_memory:
+                        await context.route("**/*", self._block_heavy_resources)
                 
-                # 使用提供的Cookie
-                print("[步骤 2] 注入Cookie...")
-                cookies = self.parse_cookie_string(self.cookie)
-                await context.add_cookies(cookies)
+                    # HAR 录制/回放：回放时所有请求都由录制文件响应，未录制的请求直接中止
+                    if self.har_mode == "record":
+                        print(f"📼 录制 HAR: {self.har_path}")
+                        await context.route_from_har(self.har_path, update=True, update_content="embed")
+                    elif self.har_mode == "replay":
+                        print(f"📼 离线回放 HAR: {self.har_path}")
+                        await context.route_from_har(self.har_path, not_found="abort")
                 
-                # 创建新页面
-                page = await context.new_page()
+                    # Playwright trace 只在内存中记录，失败时才写入文件
+                    if self.diagnostics == "trace":
+                        await context.tracing.start(screenshots=True, snapshots=True)
                 
-                # 监听API响应
-                async def handle_response(response):
-                    if 'daily_checkin' in response.url or 'checkin' in response.url:
-                        print(f"\n{'='*60}")
-                        print(f"📡 签到API响应")
-                        print(f"{'='*60}")
-                        print(f"请求URL: {response.url}")
-                        print(f"状态码: {response.status}")
+                    # 使用提供的Cookie
+                    print("[步骤 2] 注入Cookie...")
+                    cookies = self.parse_cookie_string(self.cookie)
+                    await context.add_cookies(cookies)
+                
+                    # 创建新页面
+                    page = await context.new_page()
+                
+                    # 监听API响应
+                    async def handle_response(response):
+                        if 'daily_checkin' in response.url or 'checkin' in response.url:
+                            print(f"\n{'='*60}")
+                            print(f"📡 签到API响应")
+                            print(f"{'='*60}")
+                            print(f"请求URL: {response.url}")
+                            print(f"状态码: {response.status}")
                         
-                        try:
-                            body = await response.json()
-                            print(f"\n完整响应内容:")
-                            print(json.dumps(body, ensure_ascii=False, indent=2))
+                            try:
+                                body = await response.json()
+                                print(f"\n完整响应内容:")
+                                print(json.dumps(body, ensure_ascii=False, indent=2))
                             
-                            # 保存响应数据
-                            self.api_response_data = body
+                                # 保存响应数据
+                                self.api_response_data = body
                             
-                            # 解析并显示关键信息
-                            print(f"\n{'='*60}")
-                            print("📊 签到结果详情")
-                            print(f"{'='*60}")
+                                # 解析并显示关键信息
+                                print(f"\n{'='*60}")
+                                print("📊 签到结果详情")
+                                print(f"{'='*60}")
                             
-                            if response.status == 200:
-                                if body.get('status') == 'success' or body.get('code') == 0 or body.get('success') == True:
-                                    print("✅ 签到成功！")
-                                    self.signin_success = True
-                                    self.last_checkin_result = "签到成功"
+                                if response.status == 200:
+                                    if body.get('status') == 'success' or body.get('code') == 0 or body.get('success') == True:
+                                        print("✅ 签到成功！")
+                                        self.signin_success = True
+                                        self.last_checkin_result = "签到成功"
                                     
-                                    # 提取积分信息
-                                    if 'points' in body:
-                                        self.points_gained = str(body['points'])
-                                        print(f"   🎁 获得积分: {self.points_gained}")
-                                    if 'credits' in body:
-                                        self.points_gained = str(body['credits'])
-                                        print(f"   🎁 获得积分: {self.points_gained}")
+                                        # 提取积分信息
+                                        if 'points' in body:
+                                            self.points_gained = str(body['points'])
+                                            print(f"   🎁 获得积分: {self.points_gained}")
+                                        if 'credits' in body:
+                                            self.points_gained = str(body['credits'])
+                                            print(f"   🎁 获得积分: {self.points_gained}")
                                     
-                                    # 显示消息
-                                    if 'message' in body:
-                                        self.last_checkin_result = body['message']
-                                        print(f"   💬 消息: {body['message']}")
-                                    if 'msg' in body:
-                                        self.last_checkin_result = body['msg']
-                                        print(f"   💬 消息: {body['msg']}")
+                                        # 显示消息
+                                        if 'message' in body:
+                                            self.last_checkin_result = body['message']
+                                            print(f"   💬 消息: {body['message']}")
+                                        if 'msg' in body:
+                                            self.last_checkin_result = body['msg']
+                                            print(f"   💬 消息: {body['msg']}")
                                     
-                                elif body.get('status') == 'error' or (body.get('code') and body.get('code') != 0):
-                                    print("❌ 签到失败")
-                                    msg = body.get('message') or body.get('msg') or body.get('error') or '未知错误'
-                                    self.last_checkin_result = msg
-                                    print(f"   ❗ 原因: {msg}")
+                                    elif body.get('status') == 'error' or (body.get('code') and body.get('code') != 0):
+                                        print("❌ 签到失败")
+                                        msg = body.get('message') or body.get('msg') or body.get('error') or '未知错误'
+                                        self.last_checkin_result = msg
+                                        print(f"   ❗ 原因: {msg}")
                                     
-                                    # 检查是否是已签到
-                                    if '已签到' in msg or 'already' in msg.lower():
-                                        self.signin_success = True
-                                        self.checkin_method = "今日已签到"
+                                        # 检查是否是已签到
+                                        if '已签到' in msg or 'already' in msg.lower():
+                                            self.signin_success = True
+                                            self.checkin_method = "今日已签到"
+                                    else:
+                                        print(f"📢 签到结果:")
+                                        for key, value in body.items():
+                                            print(f"   • {key}: {value}")
                                 else:
-                                    print(f"📢 签到结果:")
-                                    for key, value in body.items():
-                                        print(f"   • {key}: {value}")
-                            else:
-                                print(f"❌ 签到失败: HTTP {response.status}")
+                                    print(f"❌ 签到失败: HTTP {response.status}")
                                 
-                            print(f"{'='*60}\n")
+                                print(f"{'='*60}\n")
                             
-                        except Exception as e:
-                            print(f"\n⚠️ 解析响应失败: {e}")
+                            except Exception as e:
+                                print(f"\n⚠️ 解析响应失败: {e}")
+                            finally:
+                                if self._clicked_at is not None:
+                                    self.timings.setdefault("api_response", time.monotonic() - self._clicked_at)
+                                api_event.set()
                 
-                page.on('response', handle_response)
+                    page.on('response', handle_response)
                 
-                try:
+                    # 性能分析：开启 CDP Performance 域，记录每个请求的耗时
+                    cdp = None
+                    if self.profile:
+                        try:
+                            cdp = await context.new_cdp_session(page)
+                            await cdp.send('Performance.enable')
+                        except Exception as e:
+                            print(f"   ⚠️ 开启 CDP 性能分析失败: {e}")
+                            cdp = None
+                        page.on('requestfinished', self._record_request_timing)
+                
+                    # 记录最近的网络事件（只追加元组，成功时几乎没有开销）
+                    if self.diagnostics == "events":
+                        events = self.network_events
+                        page.on('request', lambda request: events.append(
+                            (time.time(), 'request', request.method, request.url)))
+                        page.on('response', lambda response: events.append(
+                            (time.time(), 'response', response.status, response.url)))
+                        page.on('requestfailed', lambda request: events.append(
+                            (time.time(), 'failed', request.failure, request.url)))
+                        page.on('pageerror', lambda error: events.append(
+                            (time.time(), 'pageerror', str(error), page.url)))
+                    
                     # 访问概览页面
                     print("[步骤 3] 访问用户概览页面...")
-                    await page.goto(f'{self.base_url}/zh-hans/users/overview', wait_until='domcontentloaded', timeout=30000)
+                    budget.enter("加载页面")
+                    load_started_at = time.monotonic()
+                    await self._goto_with_retry(page, f'{self.base_url}/zh-hans/users/overview')
+                    self.timings["page_load"] = time.monotonic() - load_started_at
                     print("   页面已加载，等待内容渲染...")
-                    await asyncio.sleep(3)
+                    await budget.sleep(timing["render_wait"])
+                    if self.profile:
+                        await self._profile_snapshot(page, cdp, "after_load")
                     
                     # 检查是否需要登录
                     print(f"   当前URL: {page.url}")
@@ -254,13 +913,17 @@ class TikHubCheckin:
                     
                     # 关闭弹窗
                     print("[步骤 4] 检查并关闭可能的弹窗...")
+                    budget.enter("关闭弹窗")
                     await self._close_popups(page)
                     
                     # 检查是否已签到
                     print("[步骤 5] 检查签到状态...")
+                    budget.enter("检查签到状态")
                     page_content = await page.content()
                     if '已签到' in page_content or 'Already checked' in page_content:
                         print("✅ 检测到已签到状态")
+                        if self.har_mode == "record":
+                            print("⚠️ 今日已签到，本次录制的 HAR 不会包含签到API（daily_checkin）请求")
                         self.signin_success = True
                         self.last_checkin_result = "今日已签到"
                         self.checkin_method = "今日已签到"
@@ -268,85 +931,341 @@ class TikHubCheckin:
                     # 查找并点击签到按钮
                     if not self.signin_success:
                         print("[步骤 6] 查找签到按钮...")
+                        budget.enter("查找签到按钮")
+                        discovery_started_at = time.monotonic()
                         signin_button = await self._find_signin_button(page)
+                        self.timings["button_discovery"] = time.monotonic() - discovery_started_at
                         
                         if signin_button:
                             # 模拟人类行为 - 鼠标移动
                             print("[步骤 7] 模拟人类行为...")
+                            budget.enter("模拟人类行为")
                             try:
                                 # 滚动页面
                                 await page.evaluate("window.scrollBy(0, 100)")
-                                await asyncio.sleep(0.5)
+                                await self._humanize_pause()
                                 await page.evaluate("window.scrollBy(0, -50)")
-                                await asyncio.sleep(0.3)
+                                await self._humanize_pause()
                                 
                                 # 获取按钮位置并移动鼠标
                                 box = await signin_button.bounding_box()
                                 if box:
                                     # 先移动到按钮附近
                                     await page.mouse.move(box['x'] + box['width'] / 2 - 50, box['y'] + box['height'] / 2)
-                                    await asyncio.sleep(0.2)
+                                    await self._humanize_pause()
                                     # 再移动到按钮上
                                     await page.mouse.move(box['x'] + box['width'] / 2, box['y'] + box['height'] / 2)
-                                    await asyncio.sleep(0.3)
+                                    await self._humanize_pause()
+                            except BudgetExhausted:
+                                raise
                             except Exception as e:
                                 print(f"   ⚠️ 模拟人类行为失败: {e}")
                             
                             print("[步骤 8] 点击签到按钮...")
-                            await signin_button.click()
+                            budget.enter("点击签到")
+                            self._check_cancelled()
+                            # 页面加载期间其他包含 checkin 的请求也会触发事件，点击前清除
+                            api_event.clear()
+                            self._clicked_at = time.monotonic()
+                            await signin_button.click(timeout=budget.timeout_ms(timing["goto_timeout"]))
                             
-                            # 等待签到完成或验证码出现
+                            # 等待签到完成或验证码出现（API 响应到达后立即继续）
                             print("⏳ 等待签到完成...")
-                            await asyncio.sleep(3)
+                            await budget.wait_event(api_event, timing["post_click_wait"])
                             
-                            # 检查是否有验证码
-                            print("[步骤 9] 检查验证码...")
-                            captcha_handled = await self._handle_captcha(page)
+                            if not self.signin_success:
+                                # 检查是否有验证码
+                                print("[步骤 9] 检查验证码...")
+                                budget.enter("处理验证码")
+                                captcha_handled = await self._handle_captcha(page)
+                                
+                                if captcha_handled:
+                                    print("✅ 验证码已处理，等待签到结果...")
+                                
+                                # 等待签到结果
+                                budget.enter("等待签到结果")
+                                api_event.clear()
+                                await budget.wait_event(api_event, timing["result_wait"])
                             
-                            if captcha_handled:
-                                print("✅ 验证码已处理，等待签到结果...")
-                                await asyncio.sleep(5)
-                            else:
-                                # 没有验证码或无法处理，继续等待
-                                await asyncio.sleep(5)
+                            # 签到API一直没有响应时，按重试策略重新点击
+                            api_policy = RETRY_POLICIES["api"]
+                            attempt = 1
+                            while (not self.signin_success and "api_response" not in self.timings
+                                   and attempt < api_policy["attempts"]):
+                                delay = backoff_delay(api_policy, attempt - 1)
+                                print(f"   ⚠️ 签到API无响应，{delay:.1f} 秒后重试（第 {attempt + 1} 次）")
+                                budget.enter("重试签到")
+                                await budget.sleep(delay)
+                                signin_button = await self._find_signin_button(page)
+                                if not signin_button:
+                                    break
+                                self._check_cancelled()
+                                api_event.clear()
+                                await signin_button.click(timeout=budget.timeout_ms(timing["goto_timeout"]))
+                                await budget.wait_event(api_event, timing["result_wait"])
+                                attempt += 1
                         else:
                             print("⚠️ 未找到签到按钮")
-                            # 保存调试截图
-                            try:
-                                screenshot_path = 'tikhub_debug.png'
-                                await page.screenshot(path=screenshot_path, full_page=True)
-                                print(f"📸 已保存调试截图: {screenshot_path}")
-                            except Exception as e:
-                                print(f"⚠️ 保存调试截图失败: {e}")
                     
-                    # 保存签到记录
-                    if self.signin_success:
-                        self._save_checkin_record()
+                    if self.profile and self._clicked_at is not None:
+                        await self._profile_snapshot(page, cdp, "after_checkin")
                     
-                    # 截图
-                    if not is_github_actions:
-                        await page.screenshot(path='tikhub_final.png', full_page=True)
-                        print("📸 已保存截图")
+                    # 保存签到记录（离线回放不计入签到记录）
+                    if self.signin_success and self.har_mode != "replay":
+                        self._save_checkin_record()
+                
+                try:
+                    result = await self._run_within_budget(run_in_context())
+                    if result is not None:
+                        return result
                     
+                except asyncio.CancelledError:
+                    # 对冲签到中另一次尝试先完成，本次被取消
+                    self._cancelled = True
+                    raise
+                
+                except BudgetExhausted as e:
+                    return self._budget_exhausted_result(e.phase)
+                
                 except Exception as e:
+                    # 超时参数被预算截断时，按预算耗尽处理
+                    if budget.exhausted() and not self.signin_success:
+                        return self._budget_exhausted_result(budget.phase)
                     print(f"\n❌ 执行过程中出错: {e}")
                     import traceback
                     traceback.print_exc()
                     return {"success": False, "message": f"执行出错: {str(e)}"}
                 
                 finally:
-                    await browser.close()
+                    # 只有失败时才写入诊断文件（被对冲取消的尝试不算失败）
+                    # 预算耗尽后仍会执行，因此单独限制耗时，保证单账号的最长耗时有上限
+                    if not self.signin_success and not self._cancelled:
+                        await self._with_cleanup_timeout(self._save_failure_artifacts(page, context), "保存诊断文件")
+                    elif self.diagnostics == "trace":
+                        await self._with_cleanup_timeout(context.tracing.stop(), "停止 trace")
+                    # 关闭上下文（HAR 在关闭上下文时写入）
+                    await self._with_cleanup_timeout(context.close(), "关闭浏览器上下文")
             
             # 返回结果
+            print(f"   ⏱️ 用时 {budget.elapsed():.1f} 秒（预算 {self.budget_seconds} 秒）")
+            print(f"   🧠 {format_rss_stats(self.rss_stats)}")
             if self.signin_success:
                 return {"success": True, "message": self.last_checkin_result}
             else:
                 return {"success": False, "message": self.last_checkin_result or "签到失败"}
                 
+        except BudgetExhausted as e:
+            return self._budget_exhausted_result(e.phase)
+        
         except Exception as e:
             error_msg = f"签到过程发生错误: {str(e)}"
             print(f"❌ {error_msg}")
             return {"success": False, "message": error_msg}
+        
+        finally:
+            self.timings["total"] = budget.elapsed()
+            # 被对冲取消的尝试不写性能分析报告
+            if self._cancelled and profiler is not None:
+                profiler.disable()
+            elif self.profile:
+                await self._save_profile_report(profiler)
+            if browser_manager is None:
+                await manager.stop()
+    
+    async def _run_within_budget(self, coro):
+        """在剩余时间预算内执行，超时时按预算耗尽处理"""
+        try:
+            return await asyncio.wait_for(coro, timeout=self.budget.remaining())
+        except asyncio.TimeoutError:
+            if self.budget.exhausted():
+                raise BudgetExhausted(self.budget.phase)
+            raise
+    
+    def _check_cancelled(self):
+        """点击签到前检查本次尝试是否已被对冲取消，避免重复点击"""
+        if self._cancelled:
+            raise asyncio.CancelledError()
+    
+    def _start_python_profiler(self):
+        """启动 Python 端 cProfile（分析器是线程全局的，--profile 时账号逐个签到且不对冲）"""
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            return profiler
+        except ValueError as e:
+            print(f"   ⚠️ 无法启动 cProfile: {e}")
+            return None
+    
+    def _record_request_timing(self, request):
+        """记录请求耗时（Playwright 的 timing 以毫秒为单位，相对 startTime）"""
+        timing = request.timing
+        self.profile_data["requests"].append({
+            "url": request.url,
+            "method": request.method,
+            "resource_type": request.resource_type,
+            "phase": "checkin" if self._clicked_at is not None else "load",
+            "start_time": timing.get("startTime"),
+            "dns_ms": self._timing_span(timing, "domainLookupStart", "domainLookupEnd"),
+            "connect_ms": self._timing_span(timing, "connectStart", "connectEnd"),
+            "ttfb_ms": self._timing_span(timing, "requestStart", "responseStart"),
+            "download_ms": self._timing_span(timing, "responseStart", "responseEnd"),
+            "total_ms": timing.get("responseEnd") if timing.get("responseEnd", -1) >= 0 else None,
+        })
+    
+    @staticmethod
+    def _timing_span(timing, start_key, end_key):
+        start, end = timing.get(start_key, -1), timing.get(end_key, -1)
+        if start is None or end is None or start < 0 or end < 0:
+            return None
+        return round(end - start, 3)
+    
+    async def _profile_snapshot(self, page, cdp, label: str):
+        """采集一次 CDP Performance.getMetrics 和导航计时"""
+        if cdp is not None:
+            try:
+                result = await cdp.send('Performance.getMetrics')
+                self.profile_data["performance_metrics"][label] = {
+                    item["name"]: item["value"] for item in result.get("metrics", [])
+                }
+            except Exception as e:
+                print(f"   ⚠️ 获取 CDP 性能指标失败: {e}")
+        
+        if self.profile_data["navigation_timing"] is None:
+            try:
+                self.profile_data["navigation_timing"] = await page.evaluate(
+                    "() => { const nav = performance.getEntriesByType('navigation')[0];"
+                    " return nav ? nav.toJSON() : null; }"
+                )
+            except Exception as e:
+                print(f"   ⚠️ 获取导航计时失败: {e}")
+    
+    async def _save_profile_report(self, profiler):
+        """写出账号的性能分析报告（JSON）和 cProfile 原始数据（.prof）"""
+        try:
+            os.makedirs(self.profiles_dir, exist_ok=True)
+            prefix = os.path.join(
+                self.profiles_dir,
+                f"{self.account_id or 'default'}_{get_beijing_time().strftime('%Y%m%d_%H%M%S')}"
+            )
+            
+            python_top = []
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(f"{prefix}.prof")
+                stats_text = io.StringIO()
+                pstats.Stats(profiler, stream=stats_text).sort_stats('cumulative').print_stats(30)
+                python_top = stats_text.getvalue().splitlines()
+            
+            requests_by_time = sorted(
+                self.profile_data["requests"], key=lambda r: r["total_ms"] or 0, reverse=True
+            )
+            report = {
+                "account": self.account_name,
+                "success": self.signin_success,
+                "message": self.last_checkin_result,
+                "phase_timings": {key: round(value, 3) for key, value in self.timings.items()},
+                "performance_metrics": self.profile_data["performance_metrics"],
+                "navigation_timing": self.profile_data["navigation_timing"],
+                "requests": requests_by_time,
+                "python_profile_top": python_top,
+            }
+            await asyncio.to_thread(self._write_json, f"{prefix}.profile.json", report)
+            print(f"🔬 性能分析报告: {prefix}.profile.json")
+            for key, value in report["phase_timings"].items():
+                print(f"   · {key}: {value:.3f} 秒")
+        except Exception as e:
+            print(f"⚠️ 保存性能分析报告失败: {e}")
+    
+    @staticmethod
+    def _write_json(path, data):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+    
+    @staticmethod
+    async def _block_heavy_resources(route):
+        """低内存模式：中止图片、媒体和字体请求"""
+        if route.request.resource_type in LOW_MEMORY_BLOCKED_RESOURCES:
+            await route.abort()
+        else:
+            await route.fallback()
+    
+    async def _goto_with_retry(self, page, url: str):
+        """访问页面，超时或网络错误时按重试策略指数退避重试"""
+        policy = RETRY_POLICIES["navigation"]
+        for attempt in range(policy["attempts"]):
+            try:
+                return await page.goto(url, wait_until='domcontentloaded',
+                                       timeout=self.budget.timeout_ms(self.timing["goto_timeout"]))
+            except BudgetExhausted:
+                raise
+            except Exception as e:
+                if attempt + 1 >= policy["attempts"] or self.budget.exhausted():
+                    raise
+                delay = backoff_delay(policy, attempt)
+                print(f"   ⚠️ 页面加载失败（第 {attempt + 1} 次）: {e}，{delay:.1f} 秒后重试")
+                await self.budget.sleep(delay)
+    
+    @staticmethod
+    async def _with_cleanup_timeout(coro, action: str):
+        """执行收尾操作，最多等待 CLEANUP_TIMEOUT 秒"""
+        try:
+            await asyncio.wait_for(coro, timeout=CLEANUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            print(f"⚠️ {action}超时（{CLEANUP_TIMEOUT} 秒），已跳过")
+    
+    def _budget_exhausted_result(self, phase: str):
+        """时间预算耗尽时的签到结果"""
+        self.exhausted_phase = phase
+        self.last_checkin_result = f"时间预算耗尽于阶段: {phase}（预算 {self.budget_seconds} 秒）"
+        print(f"\n⏱️ {self.last_checkin_result}")
+        return {"success": False, "message": self.last_checkin_result}
+    
+    async def _save_failure_artifacts(self, page, context):
+        """签到失败时保存诊断文件（截图、网络事件、trace），按账号区分文件名"""
+        if self.diagnostics == "off":
+            return
+        
+        try:
+            os.makedirs(self.diagnostics_dir, exist_ok=True)
+            prefix = os.path.join(
+                self.diagnostics_dir,
+                f"{self.account_id or 'default'}_{get_beijing_time().strftime('%Y%m%d_%H%M%S')}"
+            )
+            
+            # 截图（仅失败时才截图；创建页面之前出错时没有页面可截）
+            if page is not None:
+                try:
+                    await page.screenshot(path=f"{prefix}.png", full_page=True,
+                                          timeout=CLEANUP_TIMEOUT * 1000 / 2)
+                    print(f"📸 已保存失败截图: {prefix}.png")
+                except Exception as e:
+                    print(f"⚠️ 保存失败截图失败: {e}")
+            
+            if self.diagnostics == "trace":
+                # trace 本身就是 zip 压缩文件
+                await context.tracing.stop(path=f"{prefix}.trace.zip")
+                print(f"🧭 已保存 Playwright trace: {prefix}.trace.zip")
+            elif self.diagnostics == "events":
+                events = [
+                    {"time": ts, "type": kind, "detail": detail, "url": url}
+                    for ts, kind, detail, url in self.network_events
+                ]
+                await asyncio.to_thread(self._write_gzip_json, f"{prefix}.events.json.gz", {
+                    "account": self.account_name,
+                    "url": page.url if page is not None else None,
+                    "message": self.last_checkin_result,
+                    "api_response": self.api_response_data,
+                    "events": events,
+                })
+                print(f"🧾 已保存最近 {len(events)} 条网络事件: {prefix}.events.json.gz")
+        except Exception as e:
+            print(f"⚠️ 保存诊断文件失败: {e}")
+    
+    @staticmethod
+    def _write_gzip_json(path, data):
+        """写入 gzip 压缩的 JSON 文件"""
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
     
     async def _close_popups(self, page):
         """关闭弹窗"""
@@ -366,27 +1285,33 @@ class TikHubCheckin:
             '[class*="modal"] button[class*="close"]',
         ]
         
+        budget = self.budget
         popup_closed = False
         for selector in close_selectors:
+            budget.check()
             try:
-                close_btn = await page.wait_for_selector(selector, timeout=2000)
+                close_btn = await page.wait_for_selector(selector, timeout=budget.timeout_ms(self.timing["popup_timeout"]))
                 if close_btn and await close_btn.is_visible():
                     print(f"   找到弹窗关闭按钮: {selector}")
-                    await close_btn.click()
-                    await asyncio.sleep(1.5)
+                    await close_btn.click(timeout=budget.timeout_ms(self.timing["goto_timeout"]))
+                    await budget.sleep(self.timing["popup_close_wait"])
                     print("✅ 已关闭弹窗")
                     popup_closed = True
                     break
-            except:
+            except BudgetExhausted:
+                raise
+            except Exception:
                 continue
         
         # 尝试ESC键
         if not popup_closed:
             try:
                 await page.keyboard.press('Escape')
-                await asyncio.sleep(0.5)
+                await budget.sleep(self.timing["escape_wait"])
                 print("✅ 已尝试使用 ESC 键关闭弹窗")
-            except:
+            except BudgetExhausted:
+                raise
+            except Exception:
                 pass
     
     async def _find_signin_button(self, page):
@@ -428,6 +1353,7 @@ class TikHubCheckin:
         
         print("   尝试查找签到按钮...")
         for selector in selectors:
+            self.budget.check()
             try:
                 elements = await page.query_selector_all(selector)
                 for element in elements:
@@ -447,6 +1373,7 @@ class TikHubCheckin:
             # 查找所有可能的可点击元素
             all_elements = await page.query_selector_all('button, a, [role="button"], div[onclick], [class*="button"], [class*="btn"]')
             for element in all_elements:
+                self.budget.check()
                 try:
                     if await element.is_visible():
                         text = await element.inner_text()
@@ -454,9 +1381,11 @@ class TikHubCheckin:
                         if text and len(text.strip()) <= 20 and '签到' in text:
                             print(f"✅ 找到签到元素 (文本: {text.strip()})")
                             return element
-                except:
+                except Exception:
                     continue
-        except:
+        except BudgetExhausted:
+            raise
+        except Exception:
             pass
         
         # 最终尝试：直接通过 XPath 查找
@@ -469,6 +1398,7 @@ class TikHubCheckin:
                 "//*[contains(@class, 'btn') and contains(text(), '签到')]"
             ]
             for xpath in xpath_selectors:
+                self.budget.check()
                 try:
                     element = await page.query_selector(f"xpath={xpath}")
                     if element and await element.is_visible():
@@ -476,9 +1406,11 @@ class TikHubCheckin:
                         if len(text.strip()) <= 20:
                             print(f"✅ 通过 XPath 找到签到按钮 (文本: {text.strip()})")
                             return element
-                except:
+                except Exception:
                     continue
-        except:
+        except BudgetExhausted:
+            raise
+        except Exception:
             pass
         
         return None
@@ -501,6 +1433,7 @@ class TikHubCheckin:
                     captcha_element = await page.query_selector(selector)
                     if captcha_element and await captcha_element.is_visible():
                         print(f"   检测到验证码元素: {selector}")
+                        self.captcha_encountered = True
                         
                         # 如果是 reCAPTCHA
                         if 'recaptcha' in selector:
@@ -527,16 +1460,18 @@ class TikHubCheckin:
                             else:
                                 # 本地有头模式，等待用户手动完成
                                 print("   💡 请在浏览器中手动完成验证码...")
-                                await asyncio.sleep(30)  # 给用户30秒时间
+                                await self.budget.sleep(self.timing["captcha_manual_wait"])  # 给用户时间手动完成
                                 return True
                         
                         # 尝试简单的点击操作
                         print("   尝试点击验证码...")
-                        await captcha_element.click()
-                        await asyncio.sleep(2)
+                        await captcha_element.click(timeout=self.budget.timeout_ms(self.timing["goto_timeout"]))
+                        await self.budget.sleep(self.timing["captcha_click_wait"])
                         return True
                         
-                except:
+                except BudgetExhausted:
+                    raise
+                except Exception:
                     continue
             
             # 检查页面文本中是否提到验证码
@@ -549,7 +1484,7 @@ class TikHubCheckin:
                 print("     3. 需要更长的等待时间")
                 
                 # 再等待一下看验证码是否出现
-                await asyncio.sleep(3)
+                await self.budget.sleep(self.timing["captcha_recheck_wait"])
                 
                 # 再次尝试查找
                 for selector in captcha_selectors:
@@ -557,18 +1492,21 @@ class TikHubCheckin:
                         captcha_element = await page.query_selector(selector)
                         if captcha_element and await captcha_element.is_visible():
                             print(f"   延迟检测到验证码: {selector}")
+                            self.captcha_encountered = True
                             return False
-                    except:
+                    except Exception:
                         continue
             
             return False
             
+        except BudgetExhausted:
+            raise
         except Exception as e:
             print(f"   验证码处理出错: {e}")
             return False
     
     def _save_checkin_record(self):
-        """保存签到记录"""
+        """保存签到记录，并增量更新连续签到、月历和漏签统计"""
         try:
             beijing_time = get_beijing_time()
             today = beijing_time.strftime('%Y-%m-%d')
@@ -585,6 +1523,10 @@ class TikHubCheckin:
             else:
                 record = {"total": 0, "years": {}}
             
+            # 旧版本记录没有统计信息，一次性从历史记录重建
+            if "stats" not in record:
+                self._rebuild_statistics(record)
+            
             # 确保年份存在
             if year not in record["years"]:
                 record["years"][year] = {"total": 0, "months": {}}
@@ -593,190 +1535,650 @@ class TikHubCheckin:
             if month not in record["years"][year]["months"]:
                 record["years"][year]["months"][month] = {"total": 0, "days": []}
             
+            month_data = record["years"][year]["months"][month]
+            if "calendar" not in month_data:
+                month_data["calendar"] = self._empty_calendar(month)
+            
             # 检查今天是否已经签到
-            days = record["years"][year]["months"][month]["days"]
+            days = month_data["days"]
             
             # 新签到情况下更新记录
             if today not in days:
                 days.append(today)
                 record["total"] += 1
                 record["years"][year]["total"] += 1
-                record["years"][year]["months"][month]["total"] += 1
+                month_data["total"] += 1
                 
-                record["years"][year]["months"][month]["days"] = days
-                print(f"📊 签到记录已更新: 总计{record['total']}天，本月{len(days)}天")
+                month_data["days"] = days
+                self._mark_calendar(month_data, beijing_time.day)
+                self._update_streak(record["stats"], beijing_time.date())
+                print(f"📊 签到记录已更新: 总计{record['total']}天，本月{len(days)}天，"
+                      f"连续{record['stats']['current_streak']}天")
             
             # 保存记录文件
             with open(self.checkin_record_file, 'w', encoding='utf-8') as f:
                 json.dump(record, f, ensure_ascii=False, indent=2)
             
+            self.checkin_stats = self._summarize_statistics(record)
             return record
         except Exception as e:
             print(f"❌ 保存签到记录失败: {e}")
             return {"total": 0, "years": {}}
     
+    @staticmethod
+    def _empty_calendar(month: str) -> str:
+        """月历：每天一个字符，1 表示已签到，0 表示未签到"""
+        year_num, month_num = (int(part) for part in month.split('-'))
+        return "0" * calendar.monthrange(year_num, month_num)[1]
+    
+    @staticmethod
+    def _mark_calendar(month_data: dict, day: int):
+        cal = month_data["calendar"]
+        month_data["calendar"] = cal[:day - 1] + "1" + cal[day:]
+    
+    @staticmethod
+    def _update_streak(stats: dict, day):
+        """签到一天后增量更新连续签到和漏签天数"""
+        day_str = day.strftime('%Y-%m-%d')
+        last_day = stats.get("last_day")
+        if not last_day:
+            stats["first_day"] = day_str
+            stats["current_streak"] = 1
+        else:
+            gap = (day - datetime.strptime(last_day, '%Y-%m-%d').date()).days
+            if gap <= 0:
+                # 补录更早的日期不影响连续签到
+                return
+            if gap == 1:
+                stats["current_streak"] += 1
+            else:
+                stats["missed_days"] += gap - 1
+                stats["current_streak"] = 1
+        stats["last_day"] = day_str
+        stats["longest_streak"] = max(stats["longest_streak"], stats["current_streak"])
+    
+    def _rebuild_statistics(self, record: dict):
+        """从全部历史记录重建统计信息（仅用于迁移旧版本记录）"""
+        record["stats"] = {
+            "first_day": None,
+            "last_day": None,
+            "current_streak": 0,
+            "longest_streak": 0,
+            "missed_days": 0,
+        }
+        all_days = []
+        for year_data in record.get("years", {}).values():
+            for month, month_data in year_data.get("months", {}).items():
+                month_data["calendar"] = self._empty_calendar(month)
+                for day in month_data.get("days", []):
+                    self._mark_calendar(month_data, int(day[-2:]))
+                    all_days.append(day)
+        for day in sorted(all_days):
+            self._update_streak(record["stats"], datetime.strptime(day, '%Y-%m-%d').date())
+    
+    @staticmethod
+    def _summarize_statistics(record: dict) -> dict:
+        """根据记录中保存的统计信息生成通知所需的统计（不遍历历史记录）"""
+        beijing_time = get_beijing_time()
+        current_year = beijing_time.strftime('%Y')
+        current_month = beijing_time.strftime('%Y-%m')
+        today = beijing_time.date()
+        today_str = today.strftime('%Y-%m-%d')
+        
+        stats = record.get("stats", {})
+        month_data = record.get("years", {}).get(current_year, {}).get("months", {}).get(current_month, {})
+        month_days = len(month_data.get("days", []))
+        
+        # 最近一次签到早于昨天时，连续签到已中断；保存的漏签天数只包含已结束的中断，
+        # 还要加上最近一次签到到昨天之间尚未结束的中断
+        current_streak = 0
+        missed_days = stats.get("missed_days", 0)
+        last_day = stats.get("last_day")
+        if last_day:
+            gap = (today - datetime.strptime(last_day, '%Y-%m-%d').date()).days
+            if gap <= 1:
+                current_streak = stats.get("current_streak", 0)
+            else:
+                missed_days += gap - 1
+        
+        # 本月漏签：从本月1日（或首次签到日）到昨天之间未签到的天数（本月还没有签到时整月未签）
+        month_calendar = month_data.get("calendar", "")
+        first_day = stats.get("first_day")
+        month_missed = 0
+        if first_day and first_day[:7] <= current_month:
+            start = int(first_day[-2:]) if first_day[:7] == current_month else 1
+            days_calendar = month_calendar or TikHubCheckin._empty_calendar(current_month)
+            month_missed = days_calendar[start - 1:today.day - 1].count("0")
+        
+        return {
+            "total_days": record.get("total", 0),
+            "month_days": month_days,
+            "is_first_today": today_str in month_data.get("days", []),
+            "current_streak": current_streak,
+            "longest_streak": stats.get("longest_streak", 0),
+            "missed_days": missed_days,
+            "month_missed": month_missed,
+            "month_calendar": month_calendar,
+        }
+    
     def _get_checkin_statistics(self):
-        """获取签到统计信息"""
+        """获取签到统计信息（优先使用保存记录时缓存的统计）"""
+        if self.checkin_stats is not None:
+            return self.checkin_stats
+        
         try:
             if os.path.exists(self.checkin_record_file):
                 with open(self.checkin_record_file, 'r', encoding='utf-8') as f:
                     try:
                         record = json.load(f)
-                        
-                        beijing_time = get_beijing_time()
-                        current_year = beijing_time.strftime('%Y')
-                        current_month = beijing_time.strftime('%Y-%m')
-                        today = beijing_time.strftime('%Y-%m-%d')
-                        
-                        total_days = record.get("total", 0)
-                        
-                        month_data = record.get("years", {}).get(current_year, {}).get("months", {}).get(current_month, {})
-                        month_days = len(month_data.get("days", []))
-                        
-                        is_first_today = today in month_data.get("days", [])
-                        
-                        return {
-                            "total_days": total_days,
-                            "month_days": month_days,
-                            "is_first_today": is_first_today
-                        }
+                        if "stats" not in record:
+                            self._rebuild_statistics(record)
+                        self.checkin_stats = self._summarize_statistics(record)
+                        return self.checkin_stats
                     except json.JSONDecodeError:
                         pass
             
-            return {
-                "total_days": 0,
-                "month_days": 0,
-                "is_first_today": False
-            }
+            return self._summarize_statistics({"total": 0, "years": {}})
         except Exception as e:
             print(f"❌ 获取签到统计信息失败: {e}")
-            return {
-                "total_days": 0,
-                "month_days": 0,
-                "is_first_today": False
-            }
+            return self._summarize_statistics({"total": 0, "years": {}})
     
-    def send_telegram_notification(self, tg_bot_token: str, tg_chat_id: str, message: str):
-        """发送Telegram通知"""
-        if not tg_bot_token or not tg_chat_id:
-            print("⚠️ Telegram Bot Token或Chat ID为空，跳过通知")
-            return
+    def get_notify_status(self, message: str = ""):
+        """
+        获取通知中使用的签到状态
+        :return: (状态分类 success/already/failed, 状态文本, 状态图标, 标题图标)
+        """
+        if self.signin_success:
+            if "已签到" in message or "已签到" in self.last_checkin_result:
+                return "already", "今日已签到", "✓", "🔄"
+            return "success", self.last_checkin_result, "✅", "✨"
+        return "failed", "签到失败", "❌", "⚠️"
+    
+    def format_notification(self, message: str, quote: str = None, motto: str = None) -> str:
+        """构建单个账号的美化通知消息"""
+        # 获取当前日期和时间（北京时间）
+        now = get_beijing_time()
+        date_str = now.strftime("%Y年%m月%d日")
+        weekday = WEEKDAYS[now.weekday()]
+        time_str = now.strftime("%H:%M:%S")
         
-        try:
-            # 获取当前日期和时间（北京时间）
-            now = get_beijing_time()
-            date_str = now.strftime("%Y年%m月%d日")
-            weekdays = ["星期一", "星期二", "星期三", "星期四", "星期五", "星期六", "星期日"]
-            weekday = weekdays[now.weekday()]
-            time_str = now.strftime("%H:%M:%S")
-            
-            # 获取签到统计
-            stats = self._get_checkin_statistics()
-            total_days = stats["total_days"]
-            month_days = stats["month_days"]
-            is_first_today = stats["is_first_today"]
-            
-            # 构建签到统计信息
-            month_name = now.strftime("%m月")
-            stats_text = f"  · 总计已签到: {total_days} 天\n  · {month_name}已签到: {month_days} 天"
-            if is_first_today:
-                stats_text += "\n  · 今日首次签到 🆕"
-            
-            # 获取登录方式
-            login_method_icon = "🍪"
-            login_method_text = f"{login_method_icon} 登录方式: {self.login_method}"
-            
-            # 随机选择一条激励语
-            mottos = [
-                "打卡成功！向着梦想飞奔吧~",
-                "坚持签到，未来可期！",
-                "今日已签到，继续保持！",
-                "打卡完成，享受TikHub服务！",
-                "签到成功，美好的一天开始了！",
-                "打卡成功，每天进步一点点！",
-                "签到打卡，从未间断！",
-                "又是美好的一天，签到成功！"
-            ]
-            motto = random.choice(mottos)
-            
-            # 获取每日一言
-            try:
-                response = requests.get(DAILY_QUOTES_API, timeout=5)
-                if response.status_code == 200:
-                    hitokoto_data = response.json()
-                    quote = f"{hitokoto_data.get('hitokoto', '')} —— {hitokoto_data.get('from_who', '佚名') or '佚名'}"
-                else:
-                    raise Exception(f"API返回状态码: {response.status_code}")
-            except Exception as e:
-                print(f"⚠️ 获取每日一言失败: {str(e)}，使用备用格言")
-                quotes = [
-                    "不要等待，时机永远不会恰到好处。 —— 拿破仑·希尔",
-                    "合理安排时间，就等于节约时间。 —— 培根",
-                    "行动是治愈恐惧的良药。 —— 戴尔·卡耐基",
-                    "成功是一段路程，而非终点。 —— 本·斯威特兰"
-                ]
-                quote = random.choice(quotes)
-            
-            # 获取签到状态
-            if self.signin_success:
-                if "已签到" in message or "已签到" in self.last_checkin_result:
-                    status = "今日已签到"
-                    icon = "✓"
-                    header_icon = "🔄"
-                else:
-                    status = self.last_checkin_result
-                    icon = "✅"
-                    header_icon = "✨"
-            else:
-                status = "签到失败"
-                icon = "❌"
-                header_icon = "⚠️"
-            
-            # 获取积分信息
-            points_text = ""
-            if self.points_gained:
-                points_text = f"💎 本次获得: +{self.points_gained} 积分\n"
-            
-            # 构建签到方式显示
-            checkin_method_icon = "🍪"
-            
-            # 构建美化的消息
-            formatted_message = f"""{header_icon} *TikHub每日签到* {header_icon}
+        # 获取签到统计
+        stats = self._get_checkin_statistics()
+        total_days = stats["total_days"]
+        month_days = stats["month_days"]
+        is_first_today = stats["is_first_today"]
+        
+        # 构建签到统计信息
+        month_name = now.strftime("%m月")
+        stats_text = f"  · 总计已签到: {total_days} 天\n  · {month_name}已签到: {month_days} 天"
+        stats_text += f"\n  · 连续签到: {stats['current_streak']} 天（最长 {stats['longest_streak']} 天）"
+        if stats["missed_days"] or stats["month_missed"]:
+            stats_text += f"\n  · 漏签: {month_name} {stats['month_missed']} 天，累计 {stats['missed_days']} 天"
+        if is_first_today:
+            stats_text += "\n  · 今日首次签到 🆕"
+        
+        # 获取登录方式
+        login_method_icon = "🍪"
+        login_method_text = f"{login_method_icon} 登录方式: {self.login_method}"
+        
+        # 激励语和每日一言（批量发送时由调用方统一获取一次）
+        motto = motto or random.choice(MOTTOS)
+        quote = quote or get_daily_quote()
+        
+        # 获取签到状态
+        _, status, icon, header_icon = self.get_notify_status(message)
+        
+        # 获取积分信息
+        points_text = ""
+        if self.points_gained:
+            points_text = f"💎 本次获得: +{escape_markdown(self.points_gained)} 积分\n"
+        
+        # 构建签到方式显示
+        checkin_method_icon = "🍪"
+        
+        # 构建美化的消息
+        return f"""{header_icon} *TikHub每日签到* {header_icon}
 
 📅 日期: {date_str} ({weekday})
 🕒 时间: {time_str}
-👤 账号: Cookie用户
-{icon} 状态: {status}
+👤 账号: {escape_markdown(self.account_name)}
+{icon} 状态: {escape_markdown(status)}
 {login_method_text}
-{checkin_method_icon} 签到方式: {self.checkin_method}
+{checkin_method_icon} 签到方式: {escape_markdown(self.checkin_method)}
 {points_text}
 📊 签到统计:
 {stats_text}
 
 🚀 {motto}
 
-📝 每日一言: {quote}"""
+📝 每日一言: {escape_markdown(quote)}"""
+
+
+class MetricsStore:
+    """
+    跨运行的累计指标：计数器和延迟直方图
+    持久化为 JSON，并导出为 OpenMetrics 文本格式
+    """
+    
+    def __init__(self, state_file: str = None, text_file: str = None):
+        app_dir = get_app_dir()
+        self.state_file = state_file or os.path.join(app_dir, METRICS_STATE_FILE)
+        self.text_file = text_file or os.path.join(app_dir, METRICS_TEXT_FILE)
+        self._lock = threading.Lock()
+        self.state = self._load()
+    
+    def _empty_state(self):
+        return {
+            "counters": {name: 0 for name, _ in METRIC_COUNTERS},
+            "histograms": {
+                name: {"buckets": [0] * len(LATENCY_BUCKETS), "sum": 0.0, "count": 0}
+                for name, _, _ in METRIC_HISTOGRAMS
+            },
+            "last_run": 0,
+        }
+    
+    def _load(self):
+        """加载累计指标，文件不存在或损坏时从零开始"""
+        state = self._empty_state()
+        if not os.path.exists(self.state_file):
+            return state
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            state["counters"].update(saved.get("counters", {}))
+            for name, hist in saved.get("histograms", {}).items():
+                # 桶配置变化时丢弃旧数据
+                if name in state["histograms"] and len(hist.get("buckets", [])) == len(LATENCY_BUCKETS):
+                    state["histograms"][name] = hist
+            state["last_run"] = saved.get("last_run", 0)
+        except (OSError, json.JSONDecodeError, AttributeError) as e:
+            print(f"⚠️ 读取累计指标失败: {e}，将重新开始统计")
+        return state
+    
+    def inc(self, name: str, value: int = 1):
+        with self._lock:
+            self.state["counters"][name] = self.state["counters"].get(name, 0) + value
+    
+    def observe(self, name: str, seconds: float):
+        """记录一次耗时（桶内存放非累计计数，导出时再累加）"""
+        with self._lock:
+            hist = self.state["histograms"][name]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    hist["buckets"][i] += 1
+                    break
+            hist["sum"] += seconds
+            hist["count"] += 1
+    
+    def percentile(self, name: str, q: float, min_samples: int = HEDGE_MIN_SAMPLES) -> Optional[float]:
+        """
+        根据直方图估算百分位（返回所在桶的上限）
+        :param q: 百分位（0-1）
+        :return: 样本不足或落在最后一个桶之外时返回 None
+        """
+        with self._lock:
+            hist = self.state["histograms"][name]
+            if hist["count"] < min_samples:
+                return None
+            target = q * hist["count"]
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, hist["buckets"]):
+                cumulative += count
+                if cumulative >= target:
+                    return bound
+        return None
+    
+    def record_results(self, results):
+        """记录一次运行中所有账号的结果"""
+        for r in results:
+            if r["skipped"]:
+                self.inc("checkin_skipped")
+                continue
             
-            url = f"https://api.telegram.org/bot{tg_bot_token}/sendMessage"
-            data = {
-                "chat_id": tg_chat_id,
-                "text": formatted_message,
-                "parse_mode": "Markdown"
-            }
+            checkin = r["checkin"]
+            self.inc("checkin_attempts")
+            category, _, _, _ = checkin.get_notify_status(r["result"]["message"])
+            self.inc({"success": "checkin_successes", "already": "checkin_already"}.get(category, "checkin_failures"))
+            if checkin.captcha_encountered:
+                self.inc("captcha_encounters")
+            if checkin.exhausted_phase:
+                self.inc("budget_exhausted")
+            
+            for name, key, _ in METRIC_HISTOGRAMS:
+                if key in checkin.timings:
+                    self.observe(name, checkin.timings[key])
+        
+        with self._lock:
+            self.state["last_run"] = time.time()
+    
+    def render(self) -> str:
+        """导出 OpenMetrics 文本格式"""
+        with self._lock:
+            lines = []
+            for name, help_text in METRIC_COUNTERS:
+                lines.append(f"# TYPE tikhub_{name} counter")
+                lines.append(f"# HELP tikhub_{name} {help_text}")
+                lines.append(f"tikhub_{name}_total {self.state['counters'].get(name, 0)}")
             
-            response = requests.post(url, data=data, timeout=10)
+            for name, _, help_text in METRIC_HISTOGRAMS:
+                hist = self.state["histograms"][name]
+                lines.append(f"# TYPE tikhub_{name} histogram")
+                lines.append(f"# UNIT tikhub_{name} seconds")
+                lines.append(f"# HELP tikhub_{name} {help_text}")
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, hist["buckets"]):
+                    cumulative += count
+                    lines.append(f'tikhub_{name}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'tikhub_{name}_bucket{{le="+Inf"}} {hist["count"]}')
+                lines.append(f"tikhub_{name}_sum {hist['sum']:.6f}")
+                lines.append(f"tikhub_{name}_count {hist['count']}")
+            
+            lines.append("# TYPE tikhub_last_run_timestamp_seconds gauge")
+            lines.append("# UNIT tikhub_last_run_timestamp_seconds seconds")
+            lines.append("# HELP tikhub_last_run_timestamp_seconds 最近一次运行结束的时间")
+            lines.append(f"tikhub_last_run_timestamp_seconds {self.state['last_run']:.3f}")
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+    
+    def save(self):
+        """保存累计指标并写出 OpenMetrics 文本文件（先写临时文件再替换，避免被读到半个文件）"""
+        try:
+            with self._lock:
+                state_text = json.dumps(self.state, ensure_ascii=False, indent=2)
+            self._atomic_write(self.state_file, state_text)
+            self._atomic_write(self.text_file, self.render())
+            print(f"📈 累计指标已写入: {self.text_file}")
+        except OSError as e:
+            print(f"❌ 保存累计指标失败: {e}")
+    
+    @staticmethod
+    def _atomic_write(path: str, text: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+def start_metrics_server(metrics: MetricsStore, host: str, port: int):
+    """在后台线程中启动 HTTP 服务，通过 /metrics 提供 OpenMetrics 指标"""
+    
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = metrics.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/openmetrics-text; version=1.0.0; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📈 指标服务已启动: http://{host}:{port}/metrics")
+    return server
+
+
+def get_daily_quote() -> str:
+    """获取每日一言，失败时使用备用格言"""
+    try:
+        response = requests.get(DAILY_QUOTES_API, timeout=5)
+        if response.status_code == 200:
+            hitokoto_data = response.json()
+            return f"{hitokoto_data.get('hitokoto', '')} —— {hitokoto_data.get('from_who', '佚名') or '佚名'}"
+        raise Exception(f"API返回状态码: {response.status_code}")
+    except Exception as e:
+        print(f"⚠️ 获取每日一言失败: {str(e)}，使用备用格言")
+        return random.choice(FALLBACK_QUOTES)
+
+
+def escape_markdown(text: str) -> str:
+    """转义 Telegram Markdown（旧版）中的特殊字符（旧版只支持转义 _ * ` [，反斜杠原样显示）"""
+    for ch in ('_', '*', '`', '['):
+        text = text.replace(ch, '\\' + ch)
+    return text
+
+
+class TokenBucket:
+    """令牌桶限流器（异步）"""
+    
+    def __init__(self, rate: float, capacity: int = 1):
+        """
+        :param rate: 每秒补充的令牌数
+        :param capacity: 桶容量（允许的突发数量）
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        """获取一个令牌，不足时等待"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+    
+    def pause(self, seconds: float):
+        """服务端要求等待时清空令牌，推迟后续发送"""
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class TelegramSender:
+    """带令牌桶限流和 retry_after 重试的 Telegram 异步发送器"""
+    
+    def __init__(self, tg_bot_token: str, tg_chat_id: str, rate: float = TG_RATE_PER_SECOND,
+                 burst: int = 1, max_retries: int = 3):
+        self.url = f"https://api.telegram.org/bot{tg_bot_token}/sendMessage"
+        self.chat_id = tg_chat_id
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+    
+    async def send(self, text: str) -> bool:
+        """发送一条消息，遇到 429 时按 retry_after 等待后重试"""
+        data = {
+            "chat_id": self.chat_id,
+            "text": text,
+            "parse_mode": "Markdown"
+        }
+        
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            try:
+                response = await asyncio.to_thread(requests.post, self.url, data=data, timeout=10)
+            except Exception as e:
+                print(f"❌ 发送Telegram通知出错: {str(e)}")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(2 ** attempt)
+                    continue
+                return False
             
             if response.status_code == 200:
                 print("✅ Telegram通知发送成功")
-            else:
-                print(f"❌ Telegram通知发送失败: {response.status_code} - {response.text}")
+                return True
+            
+            if response.status_code == 429 and attempt < self.max_retries:
+                try:
+                    retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+                except ValueError:
+                    retry_after = 1
+                print(f"⏳ Telegram 限流，{retry_after} 秒后重试...")
+                self.bucket.pause(retry_after)
+                continue
+            
+            print(f"❌ Telegram通知发送失败: {response.status_code} - {response.text}")
+            return False
         
-        except Exception as e:
-            print(f"❌ 发送Telegram通知出错: {str(e)}")
+        return False
+
+
+def tg_text_length(text: str) -> int:
+    """Telegram 按 UTF-16 编码单元计算消息长度（emoji 占 2 个单元）"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def truncate_tg_text(text: str, limit: int) -> str:
+    """按 UTF-16 编码单元截断文本（末尾加 …），不拆开 emoji 和转义序列"""
+    if tg_text_length(text) <= limit:
+        return text
+    length = 0
+    end = 0
+    for end, ch in enumerate(text):
+        length += tg_text_length(ch)
+        if length > limit - 1:
+            break
+    # 截断点前的反斜杠属于被截断的转义序列，一并去掉
+    return text[:end].rstrip('\\') + "…"
+
+
+def build_digest_messages(results, limit: int = TG_MAX_MESSAGE_LENGTH):
+    """
+    构建汇总通知，超过长度限制时分块
+    :param results: run_accounts 返回的结果列表
+    :return: 消息文本列表
+    """
+    now = get_beijing_time()
+    counts = {"success": 0, "already": 0, "failed": 0}
+    lines = []
+    
+    for r in results:
+        name = escape_markdown(r["account"]["name"])
+        if r["skipped"]:
+            category, line = "already", f"⏭️ {name}: 今日已签到（跳过）"
+        else:
+            checkin = r["checkin"]
+            category, status, icon, _ = checkin.get_notify_status(r["result"]["message"])
+            if category == "failed":
+                status = r["result"]["message"] or status
+            line = f"{icon} {name}: {escape_markdown(status)}"
+            if checkin.points_gained:
+                line += f" (+{escape_markdown(checkin.points_gained)} 积分)"
+            if category != "failed" and checkin.checkin_stats:
+                line += f" 🔥{checkin.checkin_stats['current_streak']}天"
+        counts[category] += 1
+        # 单行过长时截断，保证每块都能放下
+        lines.append(truncate_tg_text(line, limit // 4))
+    
+    header = f"""📋 *TikHub每日签到汇总*
+
+📅 日期: {now.strftime("%Y年%m月%d日")} ({WEEKDAYS[now.weekday()]})
+🕒 时间: {now.strftime("%H:%M:%S")}
+📊 结果: ✅ 成功 {counts['success']} · 🔄 已签到 {counts['already']} · ❌ 失败 {counts['failed']}
+"""
+    footer = f"""
+🚀 {random.choice(MOTTOS)}
+
+📝 每日一言: {escape_markdown(get_daily_quote())}"""
+    
+    # 按长度把账号行分块（为续页标题预留空间）
+    chunks = []
+    current = []
+    budget = limit - tg_text_length(footer) - 64
+    current_len = tg_text_length(header) + 1
+    for line in lines:
+        line_len = tg_text_length(line) + 1
+        if current and current_len + line_len > budget:
+            chunks.append(current)
+            current = []
+            current_len = 64
+        current.append(line)
+        current_len += line_len
+    chunks.append(current)
+    
+    messages = []
+    for i, chunk in enumerate(chunks):
+        head = header if i == 0 else f"📋 *TikHub每日签到汇总* (续 {i + 1}/{len(chunks)})\n"
+        text = head + "\n" + "\n".join(chunk)
+        if i == len(chunks) - 1:
+            text += "\n" + footer
+        messages.append(text)
+    return messages
 
 
+async def send_notifications(results, tg_bot_token: str, tg_chat_id: str, digest: bool):
+    """
+    发送本次运行的 Telegram 通知（跳过的账号不单独通知）
+    :param digest: 是否以汇总消息发送
+    """
+    sender = TelegramSender(tg_bot_token, tg_chat_id)
+    
+    if digest:
+        messages = build_digest_messages(results)
+        print(f"\n📱 正在发送Telegram汇总通知（共 {len(messages)} 条）...")
+        for text in messages:
+            await sender.send(text)
+        return
+    
+    # 逐账号发送时，激励语和每日一言只获取一次
+    quote = get_daily_quote()
+    motto = random.choice(MOTTOS)
+    for r in results:
+        if r["skipped"]:
+            continue
+        print(f"\n📱 正在发送Telegram通知（{r['account']['name']}）...")
+        text = r["checkin"].format_notification(r["result"]["message"], quote=quote, motto=motto)
+        await sender.send(text)
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="TikHub 自动签到脚本")
+    parser.add_argument('--force', action='store_true',
+                        help='忽略每日签到索引，强制为所有账号重新签到')
+    parser.add_argument('--notify-mode', choices=['auto', 'single', 'digest'],
+                        help='Telegram通知方式：auto（默认，多账号时汇总）、single（逐账号）、digest（汇总）')
+    parser.add_argument('--diagnostics', choices=DIAGNOSTICS_MODES,
+                        default=os.environ.get("TIKHUB_DIAGNOSTICS") or "events",
+                        help='失败诊断模式：events（默认，记录最近网络事件）、trace（Playwright trace）、off（关闭）')
+    parser.add_argument('--timing-profile', choices=list(TIMING_PROFILES),
+                        default=os.environ.get("TIKHUB_TIMING_PROFILE"),
+                        help='时间配置：normal（默认）、fast（快速，离线回放默认）、stealthy（拟人）')
+    parser.add_argument('--budget', type=float, metavar='SECONDS',
+                        default=float(os.environ.get("TIKHUB_BUDGET") or 0) or None,
+                        help='单个账号的总时间预算（秒），默认使用时间配置中的值')
+    parser.add_argument('--concurrency', type=int, metavar='N',
+                        default=int(os.environ.get("TIKHUB_CONCURRENCY") or 1),
+                        help='同时签到的账号数量（共享一个浏览器），默认 1')
+    parser.add_argument('--low-memory', action='store_true',
+                        default=os.environ.get("TIKHUB_LOW_MEMORY", "false").lower() in ["true", "1", "yes"],
+                        help='低内存模式：精简浏览器进程，不加载图片、媒体和字体')
+    parser.add_argument('--max-browser-rss', type=float, metavar='MB',
+                        default=float(os.environ.get("TIKHUB_MAX_BROWSER_RSS") or 0) or None,
+                        help='浏览器进程树内存上限（MB），超过后等待当前账号完成并重启浏览器')
+    parser.add_argument('--profile', action='store_true',
+                        default=os.environ.get("TIKHUB_PROFILE", "false").lower() in ["true", "1", "yes"],
+                        help='为每个账号生成性能分析报告（CDP 页面指标、请求耗时、Python cProfile）')
+    parser.add_argument('--hedge-percentile', type=float, metavar='P',
+                        default=float(os.environ.get("TIKHUB_HEDGE_PERCENTILE") or HEDGE_PERCENTILE),
+                        help=f'单账号耗时超过历史耗时的该百分位时发起对冲签到，默认 {HEDGE_PERCENTILE}，0 表示关闭')
+    parser.add_argument('--hedge-after', type=float, metavar='SECONDS',
+                        default=float(os.environ.get("TIKHUB_HEDGE_AFTER") or 0) or None,
+                        help='固定的对冲签到触发时间（秒），设置后忽略 --hedge-percentile')
+    parser.add_argument('--daemon', action='store_true',
+                        help='常驻模式：每天在 --daemon-at 指定的北京时间自动签到')
+    parser.add_argument('--daemon-at', default=os.environ.get("TIKHUB_DAEMON_AT") or "08:00", metavar='HH:MM',
+                        help='常驻模式下每天签到的北京时间，默认 08:00')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        default=int(os.environ.get("TIKHUB_METRICS_PORT") or 0) or None,
+                        help='常驻模式下通过 HTTP 提供 OpenMetrics 指标的端口')
+    parser.add_argument('--metrics-host', default=os.environ.get("TIKHUB_METRICS_HOST") or "127.0.0.1",
+                        help='指标服务监听地址，默认 127.0.0.1')
+    har_group = parser.add_mutually_exclusive_group()
+    har_group.add_argument('--record-har', metavar='PATH',
+                           help='录制真实签到会话到 HAR 文件（多账号时自动按账号ID区分文件名）')
+    har_group.add_argument('--replay-har', metavar='PATH',
+                           help='从 HAR 文件离线回放签到流程，不访问网络、不更新签到记录和通知')
+    args = parser.parse_args()
+    
     print("=" * 80)
     print("TikHub 自动签到脚本")
     print("=" * 80)
@@ -784,8 +2186,8 @@ def main():
     # 检查是否自动运行（定时任务）
     is_auto_run = os.environ.get("IS_AUTO_RUN", "false").lower() in ["true", "1", "yes"]
     
-    # 如果是自动运行，添加随机延迟（1-60秒）
-    if is_auto_run:
+    # 如果是自动运行，添加随机延迟（1-60秒），离线回放不需要延迟
+    if is_auto_run and not args.replay_har:
         delay_seconds = random.randint(1, 60)
         print(f"🕒 自动运行模式，随机延迟 {delay_seconds} 秒后开始签到...")
         beijing_time = get_beijing_time()
@@ -797,7 +2199,7 @@ def main():
         print("🖐️ 手动运行模式，立即开始签到")
         print("-" * 80)
     
-    # 从环境变量获取配置
+    # 从环境变量获取配置（多账号时每行一个 `名称|Cookie`）
     cookie = os.environ.get("TIKHUB_COOKIE")
     
     # 调试信息：检查环境变量
@@ -847,30 +2249,243 @@ def main():
         print("\n提示：确保 Cookie 值包含 session_id 或类似的认证信息")
         sys.exit(1)
     
-    # 创建签到实例
-    print(f"📝 使用 Cookie 签到")
-    print(f"🍪 Cookie 长度: {len(cookie)}")
-    checkin = TikHubCheckin(cookie=cookie)
+    # 解析账号列表（每行一个账号）
+    accounts = parse_accounts(cookie)
+    print(f"👥 共 {len(accounts)} 个账号")
+    
+    # 离线回放不计入累计指标
+    metrics = None if args.replay_har else MetricsStore()
+    
+    if args.daemon:
+        run_daemon(args, accounts, tg_bot_token, tg_chat_id, metrics)
+        return
+    
+    failed_count = run_once(args, accounts, tg_bot_token, tg_chat_id, metrics)
+    
+    # 如果有账号失败，退出码为1
+    if failed_count:
+        sys.exit(1)
+
+
+def run_once(args, accounts, tg_bot_token: str, tg_chat_id: str, metrics: MetricsStore = None) -> int:
+    """
+    执行一轮签到（所有账号）
+    :return: 失败的账号数量
+    """
+    # 加载每日签到索引，跳过今天已成功签到的账号（离线回放使用独立的空索引）
+    replay = bool(args.replay_har)
+    day_index = {} if replay else load_day_index()
+    if not replay:
+        migrate_legacy_account_files(accounts, day_index)
+    today = get_beijing_time().strftime('%Y-%m-%d')
+    # 录制 HAR 时忽略签到索引，否则今天已签到的账号会被跳过而不生成 HAR 文件
+    force = args.force or bool(args.record_har)
+    if force:
+        print("💪 已启用 --force（录制 HAR 时自动启用），忽略签到索引，所有账号都将重新签到")
+    if replay:
+        print(f"📼 离线回放模式: {args.replay_har}")
+    
+    # 离线回放默认使用快速时间配置
+    timing_profile = args.timing_profile or ("fast" if replay else "normal")
+    print(f"⏱️ 时间配置: {timing_profile}，单账号预算: {args.budget or TIMING_PROFILES[timing_profile]['budget']} 秒")
+    
+    if args.record_har:
+        har_mode, har_path = "record", args.record_har
+    elif replay:
+        har_mode, har_path = "replay", args.replay_har
+    else:
+        har_mode, har_path = None, None
+    
+    # 对冲签到触发时间：固定值，或历史单账号耗时的百分位（录制 HAR 时不对冲，避免两个上下文写同一文件）
+    hedge_after = args.hedge_after
+    if hedge_after is None and metrics is not None and args.hedge_percentile > 0:
+        hedge_after = metrics.percentile("checkin_duration_seconds", args.hedge_percentile / 100)
+    if har_mode == "record":
+        hedge_after = None
+    
+    # cProfile 是线程全局的，并发或对冲时多个账号的数据会混在一起，性能分析时逐个签到
+    concurrency = args.concurrency
+    if args.profile and (concurrency > 1 or hedge_after):
+        print("🔬 性能分析模式：逐个签到，不发起对冲签到")
+        concurrency, hedge_after = 1, None
+    if hedge_after:
+        print(f"⚡ 对冲签到: 单账号超过 {hedge_after:.1f} 秒未完成时发起第二次签到")
     
-    # 执行签到
-    result = asyncio.run(checkin.checkin())
+    results = asyncio.run(run_accounts(accounts, day_index, today, force=force,
+                                       diagnostics=args.diagnostics,
+                                       har_mode=har_mode, har_path=har_path,
+                                       timing_profile=timing_profile, budget_seconds=args.budget,
+                                       concurrency=concurrency, low_memory=args.low_memory,
+                                       max_rss_mb=args.max_browser_rss, profile=args.profile,
+                                       hedge_after=hedge_after))
     
     # 输出结果
+    success_count = sum(1 for r in results if r["result"]["success"] and not r["skipped"])
+    failed_count = sum(1 for r in results if not r["result"]["success"])
+    skipped_count = sum(1 for r in results if r["skipped"])
+    
     print("\n" + "=" * 80)
     print("签到结果:")
-    print(f"状态: {'✅ 成功' if result['success'] else '❌ 失败'}")
-    print(f"信息: {result['message']}")
+    for r in results:
+        if r["skipped"]:
+            status = "⏭️ 跳过"
+        else:
+            status = "✅ 成功" if r["result"]["success"] else "❌ 失败"
+        line = f"{r['account']['name']}: {status} - {r['result']['message']}"
+        if not r["skipped"]:
+            line += f"（{format_rss_stats(r['checkin'].rss_stats)}）"
+        print(line)
+    print("-" * 80)
+    print(f"汇总: 成功 {success_count} 个，失败 {failed_count} 个，今日已完成跳过 {skipped_count} 个")
     print("=" * 80)
     
-    # 发送Telegram通知
-    if tg_bot_token and tg_chat_id:
-        print("\n📱 正在发送Telegram通知...")
-        checkin.send_telegram_notification(tg_bot_token, tg_chat_id, result['message'])
+    # 发送Telegram通知（auto：多账号时汇总为一条，单账号时逐条）
+    if tg_bot_token and tg_chat_id and not replay:
+        notify_mode = args.notify_mode or os.environ.get("TG_NOTIFY_MODE", "auto").lower()
+        digest = notify_mode == "digest" or (notify_mode == "auto" and len(accounts) > 1)
+        asyncio.run(send_notifications(results, tg_bot_token, tg_chat_id, digest))
     
-    # 如果失败，退出码为1
-    if not result["success"]:
-        sys.exit(1)
+    # 更新累计指标
+    if metrics is not None:
+        metrics.record_results(results)
+        metrics.save()
+    
+    return failed_count
+
+
+def run_daemon(args, accounts, tg_bot_token: str, tg_chat_id: str, metrics: MetricsStore = None):
+    """常驻模式：每天在指定的北京时间签到一次，并可通过 HTTP 提供指标"""
+    if metrics is not None and args.metrics_port:
+        start_metrics_server(metrics, args.metrics_host, args.metrics_port)
+    
+    hour, minute = (int(part) for part in args.daemon_at.split(':'))
+    print(f"🔁 常驻模式：每天北京时间 {hour:02d}:{minute:02d} 签到")
+    
+    while True:
+        run_once(args, accounts, tg_bot_token, tg_chat_id, metrics)
+        
+        now = get_beijing_time()
+        next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        print(f"💤 下次签到时间: {next_run.strftime('%Y-%m-%d %H:%M:%S')}")
+        time.sleep((next_run - now).total_seconds())
 
 
+async def run_accounts(accounts, day_index: Dict[str, str], today: str, force: bool = False,
+                       diagnostics: str = "events", har_mode: str = None, har_path: str = None,
+                       timing_profile: str = "normal", budget_seconds: float = None,
+                       concurrency: int = 1, low_memory: bool = False, max_rss_mb: float = None,
+                       profile: bool = False, hedge_after: float = None):
+    """
+    为所有账号签到（共享一个浏览器，每个账号使用独立上下文）
+    :param day_index: 每日签到索引，签到成功后原地更新并立即保存
+    :param today: 北京时间日期（YYYY-MM-DD）
+    :param force: 是否忽略索引强制签到
+    :param diagnostics: 失败诊断模式
+    :param har_mode: HAR 模式（record/replay）
+    :param har_path: HAR 文件路径
+    :param timing_profile: 时间配置
+    :param budget_seconds: 单个账号的总时间预算（秒）
+    :param concurrency: 同时签到的账号数量
+    :param low_memory: 是否使用低内存浏览器配置
+    :param max_rss_mb: 浏览器进程树内存上限（MB），超过后回收重启浏览器
+    :param profile: 是否生成性能分析报告
+    :param hedge_after: 单账号超过该时间（秒）未完成时发起对冲签到，None 表示不对冲
+    """
+    multi_account = len(accounts) > 1
+    manager = BrowserManager(low_memory=low_memory, max_rss_mb=max_rss_mb)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    
+    async def run_one(account):
+        if not force and day_index.get(account["id"]) == today:
+            print(f"\n⏭️ {account['name']} 今日（{today}）已签到，跳过")
+            return {
+                "account": account,
+                "checkin": None,
+                "skipped": True,
+                "result": {"success": True, "message": "今日已签到（索引命中，已跳过）"},
+            }
+        
+        async with semaphore:
+            print(f"\n📝 {account['name']} 使用 Cookie 签到")
+            print(f"🍪 Cookie 长度: {len(account['cookie'])}")
+            checkin, result = await run_hedged(account)
+        
+        # 每个账号成功后立即保存索引，任务中途被终止时已完成的账号也不会丢失（离线回放不保存）
+        if result["success"]:
+            day_index[account["id"]] = today
+            if har_mode != "replay":
+                save_day_index(day_index)
+        
+        return {
+            "account": account,
+            "checkin": checkin,
+            "skipped": False,
+            "result": result,
+        }
+    
+    def create_checkin(account, deadline: float = None):
+        return TikHubCheckin(
+            cookie=account["cookie"],
+            account_id=account["id"],
+            account_name=account["name"],
+            diagnostics=diagnostics,
+            har_mode=har_mode,
+            har_path=get_account_har_path(har_mode, har_path, account["id"]) if multi_account else har_path,
+            timing_profile=timing_profile,
+            budget_seconds=budget_seconds,
+            profile=profile,
+            deadline=deadline,
+        )
+    
+    async def run_hedged(account):
+        """
+        签到一个账号；超过 hedge_after 仍未完成时，在新的浏览器上下文中并行发起第二次签到
+        两次尝试共享同一个时间预算，先成功的结果生效，另一个被取消
+        """
+        primary = create_checkin(account)
+        first = asyncio.ensure_future(primary.checkin(manager))
+        if not hedge_after:
+            return primary, await first
+        
+        done, _ = await asyncio.wait({first}, timeout=hedge_after)
+        if done:
+            return primary, first.result()
+        
+        print(f"\n⚡ {account['name']} 超过 {hedge_after:.1f} 秒未完成，在新的浏览器上下文中发起对冲签到")
+        # 对冲签到使用第一次尝试的截止时间，单账号的最长耗时仍不超过预算
+        hedge = create_checkin(account, deadline=primary.budget.deadline)
+        attempts = {first: primary, asyncio.ensure_future(hedge.checkin(manager)): hedge}
+        pending = set(attempts)
+        finished = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                finished = (attempts[task], task.result())
+                if finished[1]["success"]:
+                    break
+            if finished[1]["success"]:
+                break
+        
+        # 取消仍在运行的另一次尝试（先标记，保证即使取消被吞掉也不会再点击签到）
+        for task in pending:
+            attempts[task]._cancelled = True
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if finished[0] is hedge:
+            print(f"⚡ {account['name']} 对冲签到先完成")
+        return finished
+    
+    try:
+        results = await asyncio.gather(*(run_one(account) for account in accounts))
+    finally:
+        await manager.stop()
+    
+    if manager.peak_rss:
+        print(f"\n🧠 浏览器内存峰值: {manager.peak_rss / 1024 / 1024:.0f} MB，回收重启 {manager.restarts} 次")
+    
+    return list(results)
+
 if __name__ == "__main__":
     main()